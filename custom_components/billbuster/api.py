@@ -0,0 +1,102 @@
+import logging
+from operator import itemgetter
+import time
+
+import aiohttp
+
+from homeassistant.util.json import json_loads
+
+_LOGGER = logging.getLogger(__name__)
+
+API_BASE_URL = "https://nexa-api.sigma-solutions.eu/api/integration"
+API_TIMEOUT = aiohttp.ClientTimeout(total=10, connect=3)
+
+# Meter points rarely change, share fetched lists between config and options flows
+METER_POINTS_CACHE_TTL = 300
+METER_POINTS_CACHE: dict[str, tuple[float, tuple[str, ...]]] = {}
+
+_name_and_address = itemgetter("name", "address")
+
+
+async def validate_api_key(
+    session: aiohttp.ClientSession, api_key: str
+) -> dict[str, str]:
+    """Validate the API key by trying to connect. Returns form errors."""
+    errors: dict[str, str] = {}
+    try:
+        async with session.post(
+            f"{API_BASE_URL}/verify-token",
+            data={"apiToken": api_key},
+            timeout=API_TIMEOUT,
+        ) as resp:
+            _LOGGER.info("Resp status is: %s", resp.status)
+            if resp.status in (400, 401):
+                _LOGGER.error("API key rejected by endpoint")
+                errors["API Token"] = "invalid_auth"
+                raise InvalidAuth("Invalid API key")
+        _LOGGER.info("API key validated successfully")
+    except aiohttp.ClientConnectorError as err:
+        _LOGGER.error("Cannot connect to API endpoint for validation: %s", err)
+        errors["base"] = "cannot_connect"
+    except InvalidAuth:
+        pass
+    except Exception:
+        _LOGGER.exception("Unknown error occurred during API key validation")
+        errors["base"] = "unknown"
+    return errors
+
+
+async def fetch_meter_points(
+    session: aiohttp.ClientSession, api_key: str
+) -> tuple[str, ...] | None:
+    """Fetch selectable meter points from the API. Returns None on failure."""
+    cached = METER_POINTS_CACHE.get(api_key)
+    if cached and time.monotonic() - cached[0] < METER_POINTS_CACHE_TTL:
+        return cached[1]
+    try:
+        async with session.post(
+            f"{API_BASE_URL}/get-meter-points",
+            data={"apiToken": api_key},
+            timeout=API_TIMEOUT,
+        ) as response:
+            if response.status != 200:
+                response.raise_for_status()
+            data = await response.json(loads=json_loads)
+            meter_points = data.get("meterPoints") if isinstance(data, dict) else None
+            if not isinstance(meter_points, list):
+                meter_points = ()
+            try:
+                fields = list(map(_name_and_address, meter_points))
+            except (KeyError, TypeError):
+                # Some entries lack a field or are not objects, look them up one by one
+                fields = [
+                    (meter_point.get("name"), meter_point.get("address"))
+                    for meter_point in meter_points
+                    if isinstance(meter_point, dict)
+                ]
+            result = tuple(
+                f"{name} ({address})" for name, address in fields if name and address
+            )
+            # An empty list is not cached, so newly added meter points show up
+            if result:
+                METER_POINTS_CACHE[api_key] = (time.monotonic(), result)
+            return result
+    except aiohttp.ClientConnectorError as err:
+        _LOGGER.error("Error connecting to API to fetch dropdown values: %s", err)
+        return None
+    except aiohttp.ClientResponseError as err:
+        if err.status == 401:
+            METER_POINTS_CACHE.pop(api_key, None)
+        _LOGGER.error("API error fetching dropdown values: %s", err)
+        return None
+    except Exception as err:
+        _LOGGER.exception("Unexpected error fetching dropdown values: %s", err)
+        return None
+
+
+class InvalidAuth(Exception):
+    """Error to indicate there is invalid auth."""
+
+
+class CannotConnect(Exception):
+    """Error to indicate there is a problem connecting."""
@@ -1,15 +1,17 @@
+import asyncio
+from functools import lru_cache
 import logging
 from typing import Any
 
-import aiohttp
 import voluptuous as vol
 
 from homeassistant import config_entries
-from homeassistant.components.billbuster.options_flow import OptionsFlowHandler
 from homeassistant.core import callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
+from .api import fetch_meter_points, validate_api_key
 from .const import (
     CONF_API_KEY,
     CONF_INVERTER_IP,
@@ -23,97 +25,52 @@ from .const import (
     DEFAULT_MIN_SOC,
     DOMAIN,
 )
+from .schema import SOC_VALIDATOR
 
 _LOGGER = logging.getLogger(__name__)
+
 DATA_SCHEMA_BASE = vol.Schema(
     {
         vol.Required(CONF_API_KEY): cv.string,
         vol.Required(CONF_INVERTER_IP): cv.string,
-        vol.Required(CONF_INVERTER_SERIAL): cv.string,
+        vol.Required(CONF_INVERTER_SERIAL): vol.Coerce(int),
         vol.Required(CONF_INVERTER_POWER): cv.positive_int,
         vol.Required(CONF_PEAK_CHARGE_POWER): cv.positive_int,
-        vol.Optional(CONF_MIN_SOC, default=DEFAULT_MIN_SOC): vol.All(
-            vol.Coerce(int), vol.Range(min=0, max=100)
-        ),
-        vol.Optional(CONF_MAX_SOC, default=DEFAULT_MAX_SOC): vol.All(
-            vol.Coerce(int), vol.Range(min=0, max=100)
-        ),
+        vol.Optional(CONF_MIN_SOC, default=DEFAULT_MIN_SOC): SOC_VALIDATOR,
+        vol.Optional(CONF_MAX_SOC, default=DEFAULT_MAX_SOC): SOC_VALIDATOR,
     }
 )
 
 
+@lru_cache(maxsize=16)
+def _select_schema(selectable_values: tuple[str, ...]) -> vol.Schema:
+    """Return the meter selection schema, compiled once per meter list."""
+    return vol.Schema({vol.Required(CONF_SELECTABLE_VALUE): vol.In(selectable_values)})
+
+
 class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Config flow for BillBuster."""
 
     VERSION = 1
 
-    async def _fetch_selectable_values(self, api_key: str) -> list[str] | None:
-        """Fetch selectable values from the API."""
-        session = aiohttp.ClientSession()
-        url = "https://nexa-api.sigma-solutions.eu/api/integration/get-meter-points"
-        token = api_key
-        try:
-            async with session.post(
-                url, data={"apiToken": token}, timeout=10
-            ) as response:
-                if response.status != 200:
-                    response.raise_for_status()
-                data = await response.json()
-                selectable_values = []
-                if "meterPoints" in data and isinstance(data["meterPoints"], list):
-                    for meter_point in data["meterPoints"]:
-                        name = meter_point.get("name")
-                        address = meter_point.get("address")
-                        if name and address:
-                            selectable_values.append(f"{name} ({address})")
-                return [value for value in selectable_values if value]
-        except aiohttp.ClientConnectorError as err:
-            _LOGGER.error("Error connecting to API to fetch dropdown values: %s", err)
-            return None
-        except aiohttp.ClientResponseError as err:
-            _LOGGER.error("API error fetching dropdown values: %s", err)
-            return None
-        except Exception as err:
-            _LOGGER.exception("Unexpected error fetching dropdown values: %s", err)
-            return None
-        finally:
-            await session.close()
-
-    async def validate_input(self, hass, data: dict[str, Any]) -> dict[str, str]:
-        """Validate the API key by trying to connect."""
-        errors: dict[str, str] = {}
-        session = aiohttp.ClientSession()
-        test_url = "https://nexa-api.sigma-solutions.eu/validate_key"
-        apiKey = data[CONF_API_KEY]
-        try:
-            async with session.get(
-                test_url, data={"apikey": apiKey}, timeout=10
-            ) as response:
-                if response.status == 401:
-                    _LOGGER.error("API key rejected by endpoint")
-                    errors["API Token"] = "invalid_auth"
-                    response.raise_for_status()
-                _LOGGER.info("API key validated successfully")
-        except aiohttp.ClientConnectorError as err:
-            _LOGGER.error("Cannot connect to API endpoint: %s", err)
-            errors["base"] = "cannot_connect"
-        except Exception as err:
-            _LOGGER.exception("Unknown error occurred during API key validation")
-            errors["base"] = "unknown"
-        finally:
-            await session.close()
-        return errors
-
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
         """Handle the initial step when user adds the integration."""
         errors: dict[str, str] = {}
         if user_input is not None:
-            validation_errors = await self.validate_input(self.hass, user_input)
+            api_key = user_input[CONF_API_KEY]
+            # Reject already configured keys before doing any network I/O
+            await self.async_set_unique_id(api_key)
+            self._abort_if_unique_id_configured()
+
+            # Both requests only need the API key, so issue them concurrently
+            session = async_get_clientsession(self.hass)
+            validation_errors, selectable_values = await asyncio.gather(
+                validate_api_key(session, api_key),
+                fetch_meter_points(session, api_key),
+            )
             if not validation_errors:
-                api_key = user_input.get(CONF_API_KEY)
-                selectable_values = await self._fetch_selectable_values(api_key)
                 if selectable_values is None:
                     errors["base"] = "cannot_connect_api_values"
                 elif not selectable_values:
@@ -122,13 +79,7 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     self.data = user_input  # Store user input in self.data
                     return self.async_show_form(
                         step_id="select",
-                        data_schema=vol.Schema(
-                            {
-                                vol.Required(CONF_SELECTABLE_VALUE): vol.In(
-                                    selectable_values
-                                )
-                            }
-                        ),
+                        data_schema=_select_schema(selectable_values),
                         errors=errors,
                     )
             else:
@@ -168,12 +119,8 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         config_entry: config_entries.ConfigEntry,
     ) -> config_entries.OptionsFlow:
         """Get the options flow for this handler."""
-        return OptionsFlowHandler()
-
-
-class InvalidAuth(Exception):
-    """Error to indicate there is invalid auth."""
+        # Imported here so options schemas are only built once the flow is opened
+        from .options_flow import OptionsFlowHandler
 
+        return OptionsFlowHandler()
 
-class CannotConnect(Exception):
-    """Error to indicate there is a problem connecting."""
@@ -4,6 +4,7 @@ import logging
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
 
 from .const import DOMAIN
 from .inverter_logic import DeyeInverter
@@ -29,7 +30,9 @@ class BillBusterCoordinator(DataUpdateCoordinator):
 
     async def _async_update_data(self):
         """Fetch data and update the inverter schedule."""
-        _LOGGER.info("Running scheduled inverter update")
+        _LOGGER.debug("Running scheduled inverter update")
+        # Failed runs retry on the regular interval, not the last schedule's
+        self.update_interval = UPDATE_INTERVAL
         try:
             success = await self.inverter.async_run_schedule_update()
             if not success:
@@ -39,8 +42,14 @@ class BillBusterCoordinator(DataUpdateCoordinator):
                 return {"last_update_status": "failed"}
 
             _LOGGER.info("Inverter schedule update completed successfully")
-            self.update_interval = self.inverter.next_run
-            _LOGGER.info("Next run scheduled at" + self.update_interval)
+            next_run = self.inverter.next_run
+            if next_run is not None:
+                remaining = dt_util.as_local(next_run) - dt_util.now()
+                # A stale CSV ends in the past, keep the regular interval until it
+                # is replaced instead of reprogramming the inverter every minute
+                if remaining > timedelta(0):
+                    self.update_interval = max(timedelta(minutes=1), remaining)
+            _LOGGER.info("Next run scheduled in %s", self.update_interval)
             return {
                 "last_update_status": "success",
                 "timestamp": self.last_update_success_time,
@@ -1,9 +1,13 @@
+from dataclasses import dataclass
 from datetime import timedelta
 import logging
 import os
+import time
 
 from deye_controller import SellProgrammer
+import numpy as np
 import pandas as pd
+from pandas.tseries.api import guess_datetime_format
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
@@ -19,6 +23,75 @@ from .const import (
 
 _LOGGER = logging.getLogger(__name__)
 
+# Only these optimizer output columns are used for scheduling
+CSV_COLUMNS = frozenset({"timestamp", "P_hybrid_inverter"})
+
+# Rows classified at a time while looking for mode runs
+RUN_SCAN_BLOCK_SIZE = 4096
+
+# Number of time-of-use program slots on the inverter
+PROGRAM_SLOTS = 6
+
+MODE_BY_SIGN = ("charge", "idle", "discharge")
+
+# Attempts at writing the program registers before giving up on the update
+UPLOAD_ATTEMPTS = 3
+
+
+def power_sign(power: np.ndarray) -> np.ndarray:
+    """Return -1/0/1 per power value, treating missing values as 0 (idle)."""
+    return np.sign(np.nan_to_num(power, nan=0.0)).astype(np.int8)
+
+
+def mode_runs(
+    power: np.ndarray, max_runs: int = PROGRAM_SLOTS
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return start rows, stop rows and signs of the first constant-sign runs.
+
+    The power column is classified block by block and scanning stops as soon
+    as max_runs runs have started, so long files are not classified in full.
+    """
+    changes = [np.empty(0, dtype=np.intp)]
+    found = 0
+    for offset in range(0, len(power), RUN_SCAN_BLOCK_SIZE):
+        # Blocks overlap by one row so changes on block edges are detected
+        sign = power_sign(power[offset : offset + RUN_SCAN_BLOCK_SIZE + 1])
+        block_changes = np.flatnonzero(sign[1:] != sign[:-1]) + offset + 1
+        changes.append(block_changes)
+        found += len(block_changes)
+        if found >= max_runs:
+            break
+    changes = np.concatenate(changes)[:max_runs]
+    run_starts = np.concatenate(([0], changes))[:max_runs]
+    run_stops = np.append(changes - 1, len(power) - 1)[:max_runs]
+    return run_starts, run_stops, power_sign(power[run_starts])
+
+
+@dataclass(slots=True, frozen=True)
+class InverterConfig:
+    """Inverter settings resolved from a config entry."""
+
+    ip: str
+    # Older entries store the serial as the string typed into the config flow
+    serial: int | str
+    power: int
+    peak_charge_power: int
+    min_soc: int
+    max_soc: int
+
+    @classmethod
+    def from_entry(cls, entry: ConfigEntry) -> "InverterConfig":
+        """Build the settings, preferring entry options over entry data."""
+        values = {**entry.data, **entry.options}
+        return cls(
+            ip=values.get(CONF_INVERTER_IP),
+            serial=values.get(CONF_INVERTER_SERIAL),
+            power=values.get(CONF_INVERTER_POWER),
+            peak_charge_power=values.get(CONF_PEAK_CHARGE_POWER),
+            min_soc=values.get(CONF_MIN_SOC),
+            max_soc=values.get(CONF_MAX_SOC),
+        )
+
 
 class BaseInverter:
     """Base class for inverter logic."""
@@ -27,59 +100,88 @@ class BaseInverter:
         """Initialize the inverter logic handler."""
         self.hass = hass
         self.entry = entry
-        self.inverter_ip = self.entry.options.get(
-            CONF_INVERTER_IP, self.entry.data.get(CONF_INVERTER_IP)
-        )
-        self.inverter_serial = self.entry.options.get(
-            CONF_INVERTER_SERIAL, self.entry.data.get(CONF_INVERTER_SERIAL)
-        )
-        self.inverter_power = self.entry.options.get(
-            CONF_INVERTER_POWER, self.entry.data.get(CONF_INVERTER_POWER)
-        )
-        self.peak_charge_power = self.entry.options.get(
-            CONF_PEAK_CHARGE_POWER, self.entry.data.get(CONF_PEAK_CHARGE_POWER)
-        )
-        self.minSoC_percent = self.entry.options.get(
-            CONF_MIN_SOC, self.entry.data.get(CONF_MIN_SOC)
-        )
-        self.maxSoC_percent = self.entry.options.get(
-            CONF_MAX_SOC, self.entry.data.get(CONF_MAX_SOC)
-        )
+        self.cfg = InverterConfig.from_entry(entry)
 
         self.df = None
         self._absolute_csv_path = "/share/opt_res_latest.csv"
+        self._timestamp_format = "ISO8601"
+        self._csv_cache: tuple[tuple[str, int, int], pd.DataFrame] | None = None
         self.next_run = None
 
-    def _resolve_csv_path(self) -> str | None:
-        """Resolve potential relative path and check existence."""
+    def _resolve_csv_path(self) -> tuple[str, os.stat_result] | None:
+        """Resolve potential relative path and stat the file in one syscall."""
         path = self._absolute_csv_path
         if not os.path.isabs(path):
             path = self.hass.config.path(path)
 
-        if not os.path.exists(path):
+        try:
+            stat = os.stat(path)
+        except OSError as e:
             _LOGGER.error(
-                "CSV file path does not exist during load: %s (resolved to %s)",
+                "CSV file path is not accessible during load: %s (resolved to %s): %s",
                 self._absolute_csv_path,
                 path,
+                e,
             )
             return None
         self._absolute_csv_path = path
-        return path
+        return path, stat
+
+    def _parse_timestamps(self) -> None:
+        """Parse timestamps not in the cached format and cache the detected one."""
+        first_value = str(self.df["timestamp"].dropna().iloc[0])
+        timestamp_format = guess_datetime_format(first_value)
+        try:
+            timestamps = pd.to_datetime(self.df["timestamp"], format=timestamp_format)
+        except ValueError:
+            timestamps = None
+        if not pd.api.types.is_datetime64_any_dtype(timestamps):
+            # Mixed UTC offsets (a DST change) only parse as UTC, convert back to
+            # local time so the programmed times stay wall-clock times
+            timestamps = pd.to_datetime(
+                self.df["timestamp"], format=timestamp_format, utc=True
+            ).dt.tz_convert(self.hass.config.time_zone)
+        self.df["timestamp"] = timestamps
+        if timestamp_format:
+            _LOGGER.debug("Detected CSV timestamp format: %s", timestamp_format)
+            self._timestamp_format = timestamp_format
 
     def load_csv(self):
         """Load the CSV, convert timestamps, and sort data. Blocking I/O."""
-        resolved_path = self._resolve_csv_path()
-        if not resolved_path:
+        resolved = self._resolve_csv_path()
+        if resolved is None:
             self.df = pd.DataFrame()
             return False
+        resolved_path, stat = resolved
 
-        _LOGGER.info("Loading CSV from: %s", resolved_path)
         try:
-            self.df = pd.read_csv(resolved_path, parse_dates=["timestamp"])
+            cache_key = (resolved_path, stat.st_mtime_ns, stat.st_size)
+            if self._csv_cache is not None and self._csv_cache[0] == cache_key:
+                _LOGGER.debug("CSV unchanged since last load: %s", resolved_path)
+                self.df = self._csv_cache[1]
+                return True
+
+            _LOGGER.info("Loading CSV from: %s", resolved_path)
+            # Read every row, a later row may sort ahead of the ones before it
+            self.df = pd.read_csv(
+                resolved_path,
+                usecols=lambda column: column in CSV_COLUMNS,
+                dtype={"P_hybrid_inverter": "float32"},
+                parse_dates=["timestamp"],
+                date_format=self._timestamp_format,
+            )
             if self.df.empty:
                 _LOGGER.warning("Loaded CSV is empty: %s", resolved_path)
                 return False
-            self.df.sort_values("timestamp", inplace=True)
+            if not pd.api.types.is_datetime64_any_dtype(self.df["timestamp"]):
+                self._parse_timestamps()
+            # Schedules have minute resolution, second precision is plenty
+            if pd.api.types.is_datetime64_any_dtype(self.df["timestamp"]):
+                self.df["timestamp"] = self.df["timestamp"].dt.as_unit("s")
+            # The optimizer normally writes rows in order, so the sort is rarely needed
+            if not self.df["timestamp"].is_monotonic_increasing:
+                self.df.sort_values("timestamp", inplace=True, kind="stable")
+            self._csv_cache = (cache_key, self.df)
             _LOGGER.debug("CSV loaded successfully. Shape: %s", self.df.shape)
             return True
         except FileNotFoundError:
@@ -105,124 +207,25 @@ class BaseInverter:
         """Generate intervals. Should be implemented by subclasses."""
         raise NotImplementedError("Subclasses should implement this method")
 
-    async def async_run_schedule_update(self):
-        """Loads data, generates intervals, and updates inverter. Runs blocking code in executor. Returns True on success"""
-
-        success = await self.hass.async_add_executor_job(self.load_csv)
-        if not success or self.df is None or self.df.empty:
-            _LOGGER.error(
-                "Failed to load or process CSV data. Aborting schedule update"
-            )
-            return False
-
-        intervals_df = await self.hass.async_add_executor_job(self.generate_intervals)
-
-        if intervals_df is None or intervals_df.empty:
-            _LOGGER.warning("No valid intervals generated from CSV data")
-            return False
-
-        _LOGGER.info(
-            "Generated %d intervals. Attempting to program inverter", len(intervals_df)
-        )
-        try:
-            await self.hass.async_add_executor_job(self._program_inverter, intervals_df)
-            _LOGGER.info("Successfully programmed inverter schedule")
-            self.next_run = intervals_df.tail(1)["stop_time"]
-            return True
-        except Exception as e:
-            _LOGGER.error("Failed to program inverter schedule: %s", e)
-            return False
-
-    def _program_inverter(self, intervals_df: pd.DataFrame):
-        """Blocking function to interact with SellProgrammer."""
-
-        _LOGGER.debug(
-            "Connecting to inverter %s (Serial: %s) for programming",
-            self.inverter_ip,
-            self.inverter_serial,
-        )
-        inverter_program = SellProgrammer(self.inverter_ip, int(self.inverter_serial))
-        try:
-            for index, interval in intervals_df.iterrows():
-                mode = interval["mode"]
-                start_time = interval["start_time"].strftime("%H:%M")
-                stop_time_dt = interval["stop_time"]
-                if interval["start_time"] == stop_time_dt:
-                    stop_time_dt += timedelta(minutes=1)
-                end_time = stop_time_dt.strftime("%H:%M")
-
-                soc = int(
-                    self.maxSoC_percent if mode == "charge" else self.minSoC_percent
-                )
-                power = int(
-                    self.peak_charge_power if mode == "charge" else self.inverter_power
-                )
-                if mode == "idle":
-                    power = 1
-
-                _LOGGER.info(
-                    f"Programming Interval {index + 1}: {start_time} - {end_time} ({mode}), Power: {power}, SoC: {soc}"
-                )
-                inverter_program.update_program(
-                    index=int(index),
-                    start_t=start_time,
-                    stop_t=end_time,
-                    soc=int(soc),
-                    power=int(power),
-                    grid_ch=str(mode == "charge"),
-                    gen_ch=False,
-                )
-
-            inverter_program.show_as_screen()
-            _LOGGER.debug("Uploading settings to inverter")
-            inverter_program.upload_settings()
-            _LOGGER.debug("Settings uploaded")
-        except Exception as e:
-            _LOGGER.error("Error during inverter programming sequence: %s", e)
-            raise
-        finally:
-            try:
-                _LOGGER.debug("Disconnecting from inverter")
-                inverter_program.disconnect()
-            except Exception as e:
-                _LOGGER.warning("Error during SellProgrammer disconnect: %s", e)
-
-    def update_from_config_entry(self, entry: ConfigEntry):
-        """Update the inverter instance with new config entry data."""
-        self.entry = entry
-        self.inverter_ip = self.entry.options.get(
-            CONF_INVERTER_IP, self.entry.data.get(CONF_INVERTER_IP)
-        )
-        self.inverter_serial = self.entry.options.get(
-            CONF_INVERTER_SERIAL, self.entry.data.get(CONF_INVERTER_SERIAL)
-        )
-        self.inverter_power = self.entry.options.get(
-            CONF_INVERTER_POWER, self.entry.data.get(CONF_INVERTER_POWER)
-        )
-        self.peak_charge_power = self.entry.options.get(
-            CONF_PEAK_CHARGE_POWER, self.entry.data.get(CONF_PEAK_CHARGE_POWER)
-        )
-        self.minSoC_percent = self.entry.options.get(
-            CONF_MIN_SOC, self.entry.data.get(CONF_MIN_SOC)
-        )
-        self.maxSoC_percent = self.entry.options.get(
-            CONF_MAX_SOC, self.entry.data.get(CONF_MAX_SOC)
-        )
-        _LOGGER.debug("DeyeInverter updated with new config: %s", entry.options)
+    def _load_and_generate_intervals(self) -> pd.DataFrame | None:
+        """Load the CSV and generate intervals in one executor job. Blocking."""
+        if not self.load_csv() or self.df is None or self.df.empty:
+            return None
+        return self.generate_intervals()
 
     async def async_run_schedule_update(self):
         """Loads data, generates intervals, and updates inverter. Runs blocking code in executor. Returns True on success."""
 
-        success = await self.hass.async_add_executor_job(self.load_csv)
-        if not success or self.df is None or self.df.empty:
+        intervals_df = await self.hass.async_add_executor_job(
+            self._load_and_generate_intervals
+        )
+        if intervals_df is None:
             _LOGGER.error(
                 "Failed to load or process CSV data. Aborting schedule update"
             )
             return False
 
-        intervals_df = await self.hass.async_add_executor_job(self.generate_intervals)
-
-        if intervals_df is None or intervals_df.empty:
+        if intervals_df.empty:
             _LOGGER.warning("No valid intervals generated from CSV data")
             return False
 
@@ -230,9 +233,10 @@ class BaseInverter:
             "Generated %d intervals. Attempting to program inverter", len(intervals_df)
         )
         try:
-            _LOGGER.warning("Intervals_df value is:", intervals_df)
+            _LOGGER.debug("Intervals df shape: %s", intervals_df.shape)
             await self.hass.async_add_executor_job(self._program_inverter, intervals_df)
             _LOGGER.info("Successfully programmed inverter schedule")
+            self.next_run = intervals_df["stop_time"].iloc[-1]
             return True
         except Exception as e:
             _LOGGER.error("Failed to program inverter schedule: %s", e)
@@ -241,30 +245,41 @@ class BaseInverter:
     def _program_inverter(self, intervals_df: pd.DataFrame):
         """Blocking function to interact with SellProgrammer."""
 
+        cfg = self.cfg
         _LOGGER.debug(
             "Connecting to inverter %s (Serial: %s) for programming",
-            self.inverter_ip,
-            self.inverter_serial,
+            cfg.ip,
+            cfg.serial,
         )
-        inverter_program = SellProgrammer(self.inverter_ip, self.inverter_serial)
-        try:
-            for index, interval in intervals_df.iterrows():
-                mode = interval["mode"]
-                start_time = interval["start_time"].strftime("%H:%M")
-                stop_time_dt = interval["stop_time"]
-                if interval["start_time"] == stop_time_dt:
-                    stop_time_dt += timedelta(minutes=1)
-                end_time = stop_time_dt.strftime("%H:%M")
-
-                soc = self.maxSoC_percent if mode == "charge" else self.minSoC_percent
-                power = (
-                    self.peak_charge_power if mode == "charge" else self.inverter_power
-                )
-                if mode == "idle":
-                    power = 1
+        modes = intervals_df["mode"].to_numpy()
+        is_charge = modes == "charge"
+        socs = np.where(is_charge, cfg.max_soc, cfg.min_soc).tolist()
+        powers = np.where(
+            modes == "idle", 1, np.where(is_charge, cfg.peak_charge_power, cfg.power)
+        ).tolist()
+        grid_flags = is_charge.tolist()
+        start_times = intervals_df["start_time"]
+        stop_times = intervals_df["stop_time"]
+        # Zero-length intervals are programmed as lasting one minute
+        stop_times = stop_times.where(
+            stop_times != start_times, stop_times + pd.Timedelta(minutes=1)
+        )
+        start_strs = start_times.dt.strftime("%H:%M").tolist()
+        stop_strs = stop_times.dt.strftime("%H:%M").tolist()
 
+        inverter_program = SellProgrammer(cfg.ip, int(cfg.serial))
+        try:
+            for index, (start_time, end_time, mode, soc, power, grid_ch) in enumerate(
+                zip(start_strs, stop_strs, modes, socs, powers, grid_flags)
+            ):
                 _LOGGER.info(
-                    f"Programming Interval {index + 1}: {start_time} - {end_time} ({mode}), Power: {power}, SoC: {soc}"
+                    "Programming Interval %d: %s - %s (%s), Power: %s, SoC: %s",
+                    index + 1,
+                    start_time,
+                    end_time,
+                    mode,
+                    power,
+                    soc,
                 )
                 inverter_program.update_program(
                     index=index,
@@ -272,13 +287,27 @@ class BaseInverter:
                     stop_t=end_time,
                     soc=soc,
                     power=power,
-                    grid_ch=(mode == "charge"),
+                    grid_ch=grid_ch,
                     gen_ch=False,
                 )
 
             _LOGGER.debug(inverter_program.show_as_screen())
             _LOGGER.debug("Uploading settings to inverter")
-            inverter_program.upload_settings()
+            # All slots are written in one request, retried on the open connection
+            for attempt in range(1, UPLOAD_ATTEMPTS + 1):
+                try:
+                    inverter_program.upload_settings()
+                    break
+                except (ConnectionError, TimeoutError) as e:
+                    if attempt == UPLOAD_ATTEMPTS:
+                        raise
+                    _LOGGER.warning(
+                        "Uploading settings failed (attempt %d/%d): %s",
+                        attempt,
+                        UPLOAD_ATTEMPTS,
+                        e,
+                    )
+                    time.sleep(0.1 * attempt)
             _LOGGER.debug("Settings uploaded")
         except Exception as e:
             _LOGGER.error("Error during inverter programming sequence: %s", e)
@@ -293,21 +322,7 @@ class BaseInverter:
     def update_from_config_entry(self, entry: ConfigEntry):
         """Update the inverter instance with new config entry data."""
         self.entry = entry
-
-        self.inverter_ip = entry.options.get(
-            "inverter_ip", entry.data.get("inverter_ip")
-        )
-        self.inverter_serial = entry.options.get(
-            "inverter_serial", entry.data.get("inverter_serial")
-        )
-        self.inverter_power = entry.options.get(
-            "inverter_power", entry.data.get("inverter_power")
-        )
-        self.peak_charge_power = entry.options.get(
-            "peak_charge_power", entry.data.get("peak_charge_power")
-        )
-        self.minSoC_percent = entry.options.get("min_soc", entry.data.get("min_soc"))
-        self.maxSoC_percent = entry.options.get("max_soc", entry.data.get("max_soc"))
+        self.cfg = InverterConfig.from_entry(entry)
         _LOGGER.debug("DeyeInverter updated with new config: %s", entry.options)
 
 
@@ -329,78 +344,40 @@ class DeyeInverter(BaseInverter):
 
         _LOGGER.debug("Generating intervals based on 'P_hybrid_inverter' column")
 
-        def get_mode(p):
-            if p > 0:
-                return "discharge"
-            if p < 0:
-                return "charge"
-            return "idle"
-
         try:
-            self.df["mode"] = self.df["P_hybrid_inverter"].apply(get_mode)
-
-            intervals = []
-            if len(self.df) == 0:
-                _LOGGER.warning(
-                    "DataFrame is empty after mode calculation (shouldn't happen here)"
-                )
-                return pd.DataFrame()
-
-            start_time = self.df.iloc[0]["timestamp"]
-            current_mode = self.df.iloc[0]["mode"]
-
-            for i in range(1, len(self.df)):
-                new_mode = self.df.iloc[i]["mode"]
-                timestamp = self.df.iloc[i]["timestamp"]
-                prev_timestamp = self.df.iloc[i - 1]["timestamp"]
-                if new_mode != current_mode:
-                    stop_time = prev_timestamp
-                    intervals.append(
-                        {
-                            "start_time": start_time,
-                            "stop_time": stop_time,
-                            "mode": current_mode,
-                        }
-                    )
-                    start_time = timestamp
-                    current_mode = new_mode
-            intervals.append(
+            # Only the first runs are programmed
+            run_starts, run_stops, signs = mode_runs(
+                self.df["P_hybrid_inverter"].to_numpy()
+            )
+            timestamps = self.df["timestamp"]
+            intervals_df = pd.DataFrame(
                 {
-                    "start_time": start_time,
-                    "stop_time": self.df.iloc[-1]["timestamp"],
-                    "mode": current_mode,
+                    "start_time": timestamps.iloc[run_starts].reset_index(drop=True),
+                    "stop_time": timestamps.iloc[run_stops].reset_index(drop=True),
+                    # Sign -1/0/1 shifted by one is the category code in MODE_BY_SIGN
+                    "mode": pd.Categorical.from_codes(
+                        signs + 1, categories=MODE_BY_SIGN
+                    ),
                 }
             )
-
-            intervals_df = pd.DataFrame(intervals)
             _LOGGER.debug("Raw intervals generated: %d", len(intervals_df))
 
-            intervals_df = intervals_df.head(6)
-
-            if len(intervals_df) < 6:
-                _LOGGER.debug("Padding intervals to reach 6.")
-                last_stop = intervals_df.iloc[-1]["stop_time"]
-                for _ in range(6 - len(intervals_df)):
-                    next_start = last_stop + timedelta(minutes=1)
-                    next_stop = next_start
-                    next_stop += timedelta(minutes=1)
-
-                    intervals_df = pd.concat(
-                        [
-                            intervals_df,
-                            pd.DataFrame(
-                                [
-                                    {
-                                        "start_time": next_start,
-                                        "stop_time": next_stop,
-                                        "mode": "idle",
-                                    }
-                                ]
-                            ),
-                        ],
-                        ignore_index=True,
-                    )
-                    last_stop = next_stop  # Update for next padding iteration
+            missing = PROGRAM_SLOTS - len(intervals_df)
+            if missing > 0:
+                _LOGGER.debug("Padding intervals to reach %d.", PROGRAM_SLOTS)
+                # Each idle pad lasts one minute, one minute after the previous one
+                last_stop = intervals_df["stop_time"].iloc[-1]
+                starts = [
+                    last_stop + timedelta(minutes=2 * i + 1) for i in range(missing)
+                ]
+                padding = pd.DataFrame(
+                    {
+                        "start_time": starts,
+                        "stop_time": [start + timedelta(minutes=1) for start in starts],
+                        "mode": ["idle"] * missing,
+                    }
+                )
+                intervals_df = pd.concat([intervals_df, padding], ignore_index=True)
 
             _LOGGER.debug(
                 "Final intervals generated (padded/limited): %d", len(intervals_df)
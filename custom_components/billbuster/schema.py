@@ -0,0 +1,4 @@
+import voluptuous as vol
+
+# Kept as plain vol.Coerce/vol.Range so voluptuous_serialize can render the form
+SOC_VALIDATOR = vol.All(vol.Coerce(int), vol.Range(min=0, max=100))